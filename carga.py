@@ -0,0 +1,67 @@
+import random
+import time
+
+# Gerador de carga para o caminho programático (adquirir_recurso/liberar_recurso).
+#
+# Modelo fechado: cada processo tem no máximo uma requisição em andamento e
+# espera um tempo de "pensamento" entre liberar e requisitar novamente.
+# Modelo aberto: as chegadas seguem um processo de Poisson com taxa fixa,
+# independente da conclusão das anteriores; a latência é medida a partir do
+# instante de chegada planejado, incluindo o tempo na fila local.
+
+MODELOS = ("fechado", "aberto")
+
+
+# Carga em ciclo fechado: retorna as latências de aquisição (segundos)
+def ciclo_fechado(no, recurso: str, duracao: float, tempo_secao: float, tempo_pensar: float):
+    latencias = []
+    fim = time.perf_counter() + duracao
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        no.adquirir_recurso(recurso)
+        latencias.append(time.perf_counter() - inicio)
+        if tempo_secao > 0:
+            time.sleep(tempo_secao)
+        no.liberar_recurso(recurso)
+        if tempo_pensar > 0:
+            time.sleep(random.expovariate(1 / tempo_pensar))
+    return latencias
+
+
+# Carga em ciclo aberto: retorna as latências desde a chegada planejada (segundos)
+def ciclo_aberto(no, recurso: str, duracao: float, tempo_secao: float, taxa: float):
+    latencias = []
+    agora = time.perf_counter()
+    fim = agora + duracao
+    chegada = agora + random.expovariate(taxa)
+    while chegada < fim:
+        espera = chegada - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+        no.adquirir_recurso(recurso)
+        latencias.append(time.perf_counter() - chegada)
+        if tempo_secao > 0:
+            time.sleep(tempo_secao)
+        no.liberar_recurso(recurso)
+        chegada += random.expovariate(taxa)
+    return latencias
+
+
+# Percentil por posição em uma lista já ordenada
+def percentil(ordenadas, p: float):
+    if not ordenadas:
+        return 0.0
+    indice = min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))
+    return ordenadas[indice]
+
+
+# Resumo das latências em milissegundos
+def resumir_latencias(latencias):
+    ordenadas = sorted(latencias)
+    return {
+        "media_ms": 1000 * sum(ordenadas) / len(ordenadas) if ordenadas else 0.0,
+        "p50_ms": 1000 * percentil(ordenadas, 50),
+        "p95_ms": 1000 * percentil(ordenadas, 95),
+        "p99_ms": 1000 * percentil(ordenadas, 99),
+        "max_ms": 1000 * ordenadas[-1] if ordenadas else 0.0,
+    }
@@ -0,0 +1,345 @@
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+
+import carga
+import falhas
+
+# Inicializador de cluster: sobe N processos do algoritmo em loopback, cada um
+# fixado em um núcleo, executa o gerador de carga e consolida um relatório.
+# Os processos reutilizam p1.py como modelo, sobrescrevendo a configuração.
+# Com --cenario, cada enlace passa por um proxy de falhas (falhas.py).
+
+MODULO_NO = "p1"
+HOST = "localhost"
+
+# Cabeçalho e linha da tabela de resultados
+CABECALHO = "{:<6} {:>6} {:>8} {:>10} {:>10} {:>10} {:>10} {:>10} {:>8} {:>8} {:>7}".format(
+    "no", "nucleo", "ops", "ops/s", "media ms", "p50 ms", "p99 ms", "max ms", "msg/sc", "qdr/sc", "agrup"
+)
+LINHA = "{:<6} {:>6} {:>8} {:>10.1f} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f} {:>8.2f} {:>8.2f} {:>7.2f}"
+
+
+# Monta o mapa de processos do cluster (equivalente a PROCESSOS nos arquivos pN.py)
+def montar_processos(quantidade: int, porta_base: int):
+    return {f"p{i + 1}": (HOST, porta_base + i) for i in range(quantidade)}
+
+
+# Divide os processos em grupos contíguos (equivalente a GRUPOS nos arquivos pN.py);
+# os tamanhos diferem em no máximo um processo
+def montar_grupos(processos, quantidade: int):
+    if quantidade <= 1:
+        return {}
+    ids = list(processos)
+    tamanho, sobra = divmod(len(ids), quantidade)
+    grupos = {}
+    inicio = 0
+    for i in range(quantidade):
+        fim = inicio + tamanho + (1 if i < sobra else 0)
+        grupos[f"g{i + 1}"] = ids[inicio:fim]
+        inicio = fim
+    return grupos
+
+
+# Distribui os nós entre os núcleos disponíveis
+def distribuir_nucleos(processos, nucleos):
+    return {id_no: nucleos[i % len(nucleos)] for i, id_no in enumerate(processos)}
+
+
+# Configura o módulo do nó para execução não interativa
+def configurar_no(id_no: str, processos, args):
+    no = importlib.import_module(MODULO_NO)
+    no.ID_PROCESSO = id_no
+    no.HOST, no.PORT = processos[id_no]
+    no.PROCESSOS = dict(processos)
+    no.GRUPOS = montar_grupos(processos, args.grupos)
+    no.debug_mode = False
+    no.modo_interativo = False
+    no.janela_envio = args.janela_envio
+    no.tempo_retransmissao = args.retransmissao
+    return no
+
+
+# Executa a carga conforme o modelo escolhido
+def executar_carga(no, args, duracao):
+    if args.modelo == "aberto":
+        return carga.ciclo_aberto(no, args.recurso, duracao, args.secao, args.taxa)
+    return carga.ciclo_fechado(no, args.recurso, duracao, args.secao, args.pensar)
+
+
+# Corpo de cada processo filho; um processo reiniciado não espera a barreira
+# e roda a carga apenas pelo tempo restante
+def executar_no(id_no, processos, nucleo, args, barreira, resultados, encerrar, duracao_carga=None):
+    if nucleo is not None:
+        os.sched_setaffinity(0, {nucleo})
+    no = configurar_no(id_no, processos, args)
+    if args.diario:
+        no.iniciar_diario(os.path.join(args.diario, no.ARQUIVO_DIARIO.format(id_no)))
+    threading.Thread(target=no.servidor, daemon=True).start()
+    time.sleep(0.5)  # Aguarda o servidor aceitar conexões
+    no.retomar_requisicao()
+    if no.recurso_ocupado:
+        # Quem usava o recurso morreu junto com o processo anterior
+        no.liberar_recurso(no.esperando_recurso)
+    if barreira is not None:
+        barreira.wait()
+
+    inicio = time.perf_counter()
+    latencias = executar_carga(no, args, duracao_carga or args.duracao)
+    duracao = time.perf_counter() - inicio
+
+    resultados.put(
+        {
+            "id": id_no,
+            "nucleo": nucleo,
+            "operacoes": len(latencias),
+            "duracao": duracao,
+            "vazao": len(latencias) / duracao if duracao else 0.0,
+            "latencias": latencias,
+            "mensagens": no.mensagens_enviadas,
+            "quadros": no.quadros_enviados,
+            "entre_grupos": no.mensagens_entre_grupos,
+            "grupos": len(no.GRUPOS) or 1,
+            "recuperacao_ms": no.tempo_recuperacao,
+            "reiniciado": barreira is None,
+        }
+    )
+    # Continua respondendo aos demais até que todos terminem
+    encerrar.wait()
+
+
+# Sobe o cluster e coleta os resultados de todos os processos
+def executar_cluster(args):
+    processos = montar_processos(args.nos, args.porta_base)
+    if args.sem_afinidade:
+        nucleos = {id_no: None for id_no in processos}
+    else:
+        disponiveis = sorted(os.sched_getaffinity(0))
+        if args.nucleos:
+            disponiveis = disponiveis[: args.nucleos]
+        nucleos = distribuir_nucleos(processos, disponiveis)
+
+    rotas = {id_no: processos for id_no in processos}
+    proxies = {}
+    if args.cenario:
+        proxies = falhas.montar_proxies(processos, args.porta_proxy or args.porta_base + 100)
+        rotas = falhas.montar_rotas(processos, proxies)
+
+    contexto = multiprocessing.get_context("fork")
+    barreira = contexto.Barrier(len(processos) + 1)
+    resultados = contexto.Queue()
+    encerrar = contexto.Event()
+    filhos = [
+        contexto.Process(
+            target=executar_no,
+            args=(id_no, rotas[id_no], nucleos[id_no], args, barreira, resultados, encerrar),
+            daemon=True,
+        )
+        for id_no in processos
+    ]
+    for filho in filhos:
+        filho.start()
+    for proxy in proxies.values():
+        proxy.iniciar()
+    barreira.wait()
+    if args.cenario:
+        cenario = falhas.carregar_cenario(args.cenario)
+        threading.Thread(target=falhas.executar_cenario, args=(proxies, cenario), daemon=True).start()
+    if args.reinicio:
+        # Derruba o processo escolhido (SIGKILL) e o sobe de novo a partir do diário
+        time.sleep(args.reinicio)
+        indice = list(processos).index(args.no_reinicio)
+        filhos[indice].kill()
+        filhos[indice].join()
+        filhos[indice] = contexto.Process(
+            target=executar_no,
+            args=(args.no_reinicio, rotas[args.no_reinicio], nucleos[args.no_reinicio], args, None, resultados, encerrar),
+            kwargs={"duracao_carga": args.duracao - args.reinicio},
+            daemon=True,
+        )
+        filhos[indice].start()
+
+    # Limite generoso para não travar o teste se um processo ficar bloqueado
+    coletados = []
+    try:
+        for _ in filhos:
+            coletados.append(resultados.get(timeout=args.duracao + args.limite))
+    except queue.Empty:
+        sys.exit(f"Tempo esgotado: {len(coletados)} de {len(filhos)} processos terminaram a carga")
+    encerrar.set()
+    for filho in filhos:
+        filho.join(timeout=2)
+    coletados.sort(key=lambda r: int(r["id"][1:]))
+    return coletados, falhas.resumir_estatisticas(proxies) if proxies else None
+
+
+# Mensagens e quadros (conexões/syscalls de envio) por seção crítica
+def medir_envio(mensagens, quadros, entre_grupos, operacoes):
+    return {
+        "mensagens": mensagens,
+        "entre_grupos_por_sc": entre_grupos / operacoes if operacoes else 0.0,
+        "quadros": quadros,
+        "mensagens_por_sc": mensagens / operacoes if operacoes else 0.0,
+        "quadros_por_sc": quadros / operacoes if operacoes else 0.0,
+        "agrupamento": mensagens / quadros if quadros else 1.0,
+    }
+
+
+# Consolida os resultados individuais em um único relatório
+def montar_relatorio(resultados, args, estatisticas_falhas=None):
+    todas = [lat for r in resultados for lat in r["latencias"]]
+    duracao = max(r["duracao"] for r in resultados)
+    operacoes = sum(r["operacoes"] for r in resultados)
+    return {
+        "configuracao": {
+            "nos": args.nos,
+            "modelo": args.modelo,
+            "duracao": args.duracao,
+            "secao": args.secao,
+            "taxa": args.taxa,
+            "pensar": args.pensar,
+            "nucleos": len({r["nucleo"] for r in resultados}),
+            "janela_envio": args.janela_envio,
+            "grupos": resultados[0]["grupos"],
+            "cenario": args.cenario,
+            "retransmissao": args.retransmissao,
+            "reinicio": args.reinicio,
+        },
+        "total": {
+            "operacoes": operacoes,
+            "vazao": operacoes / duracao if duracao else 0.0,
+            **carga.resumir_latencias(todas),
+            **medir_envio(
+                sum(r["mensagens"] for r in resultados),
+                sum(r["quadros"] for r in resultados),
+                sum(r["entre_grupos"] for r in resultados),
+                operacoes,
+            ),
+        },
+        "processos": [
+            {
+                "id": r["id"],
+                "nucleo": r["nucleo"],
+                "operacoes": r["operacoes"],
+                "vazao": r["vazao"],
+                "recuperacao_ms": r["recuperacao_ms"],
+                "reiniciado": r["reiniciado"],
+                **carga.resumir_latencias(r["latencias"]),
+                **medir_envio(r["mensagens"], r["quadros"], r["entre_grupos"], r["operacoes"]),
+            }
+            for r in resultados
+        ],
+        "falhas": estatisticas_falhas,
+    }
+
+
+# Compara com um relatório de referência: vazão menor ou p99 maior que a tolerância
+def comparar_referencia(relatorio, referencia, tolerancia: float):
+    atual, base = relatorio["total"], referencia["total"]
+    regressoes = []
+    if atual["vazao"] < base["vazao"] * (1 - tolerancia):
+        regressoes.append(f"vazão {atual['vazao']:.1f} ops/s < referência {base['vazao']:.1f} ops/s")
+    if atual["p99_ms"] > base["p99_ms"] * (1 + tolerancia):
+        regressoes.append(f"p99 {atual['p99_ms']:.2f} ms > referência {base['p99_ms']:.2f} ms")
+    return regressoes
+
+
+# Imprime o relatório em formato de tabela
+def imprimir_relatorio(relatorio):
+    config = relatorio["configuracao"]
+    print(
+        f"Cluster: {config['nos']} nós em {config['grupos']} grupo(s) e {config['nucleos']} núcleo(s), "
+        f"modelo {config['modelo']}, {config['duracao']}s"
+    )
+    print(CABECALHO)
+    linhas = relatorio["processos"] + [{"id": "total", "nucleo": "-", **relatorio["total"]}]
+    for r in linhas:
+        print(
+            LINHA.format(
+                r["id"],
+                str(r["nucleo"]),
+                r["operacoes"],
+                r["vazao"],
+                r["media_ms"],
+                r["p50_ms"],
+                r["p99_ms"],
+                r["max_ms"],
+                r["mensagens_por_sc"],
+                r["quadros_por_sc"],
+                r["agrupamento"],
+            )
+        )
+    if config["grupos"] > 1:
+        print(f"Mensagens entre grupos por seção crítica: {relatorio['total']['entre_grupos_por_sc']:.2f}")
+    for r in relatorio["processos"]:
+        if r["reiniciado"]:
+            print(f"{r['id']} reiniciado em {config['reinicio']}s: estado recuperado em {r['recuperacao_ms']:.2f} ms")
+        elif r["recuperacao_ms"] is not None:
+            print(f"{r['id']}: diário aberto em {r['recuperacao_ms']:.2f} ms")
+    if relatorio["falhas"]:
+        estatisticas = relatorio["falhas"]
+        print(
+            f"Cenário {config['cenario']}: {estatisticas['quadros']} quadros nos proxies, "
+            f"{estatisticas['descartados']} descartados"
+        )
+
+
+def ler_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Executa um cluster local com gerador de carga.")
+    parser.add_argument("--nos", type=int, default=3, help="quantidade de processos")
+    parser.add_argument("--porta-base", type=int, default=9001, help="porta do primeiro processo")
+    parser.add_argument("--grupos", type=int, default=1, help="grupos do modo hierárquico (1 = modo plano)")
+    parser.add_argument("--nucleos", type=int, default=0, help="limita os núcleos usados (0 = todos)")
+    parser.add_argument("--sem-afinidade", action="store_true", help="não fixa processos em núcleos")
+    parser.add_argument("--modelo", choices=carga.MODELOS, default="fechado")
+    parser.add_argument("--duracao", type=float, default=5.0, help="segundos de carga por processo")
+    parser.add_argument("--secao", type=float, default=0.0, help="tempo na seção crítica (s)")
+    parser.add_argument("--pensar", type=float, default=0.0, help="tempo médio entre requisições no modelo fechado (s)")
+    parser.add_argument("--taxa", type=float, default=10.0, help="chegadas por segundo por processo no modelo aberto")
+    parser.add_argument("--recurso", default="r1")
+    parser.add_argument("--janela-envio", type=float, default=0.0, help="janela de agrupamento de mensagens por destino (s)")
+    parser.add_argument("--retransmissao", type=float, default=0.5, help="segundos sem resposta até reenviar requisições (0 = nunca)")
+    parser.add_argument("--cenario", help="cenário de falhas em JSON aplicado por proxies entre os processos")
+    parser.add_argument("--porta-proxy", type=int, default=0, help="porta do primeiro proxy (padrão: porta base + 100)")
+    parser.add_argument("--limite", type=float, default=60.0, help="segundos além da duração para aguardar os resultados")
+    parser.add_argument("--referencia", help="relatório JSON de referência para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="tolerância relativa na comparação com a referência")
+    parser.add_argument("--diario", help="diretório dos diários de estado (desativado se omitido)")
+    parser.add_argument("--reinicio", type=float, default=0.0, help="derruba e reinicia um processo após estes segundos de carga (requer --diario)")
+    parser.add_argument("--no-reinicio", default="p1", help="processo derrubado por --reinicio")
+    parser.add_argument("--json", help="grava o relatório completo neste arquivo")
+    args = parser.parse_args(argv)
+    if not 1 <= args.grupos <= args.nos:
+        parser.error("--grupos deve ficar entre 1 e --nos")
+    if args.reinicio:
+        if not args.diario:
+            parser.error("--reinicio requer --diario")
+        if not 0 < args.reinicio < args.duracao:
+            parser.error("--reinicio deve ficar entre 0 e a duração")
+        if args.retransmissao <= 0:
+            parser.error("--reinicio requer --retransmissao > 0")
+    return args
+
+
+# Inicialização
+if __name__ == "__main__":
+    args = ler_argumentos()
+    resultados, estatisticas_falhas = executar_cluster(args)
+    relatorio = montar_relatorio(resultados, args, estatisticas_falhas)
+    imprimir_relatorio(relatorio)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(relatorio, f, indent=2)
+    if args.referencia:
+        with open(args.referencia) as f:
+            regressoes = comparar_referencia(relatorio, json.load(f), args.tolerancia)
+        for regressao in regressoes:
+            print(f"Regressão: {regressao}")
+        if regressoes:
+            sys.exit(1)
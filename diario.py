@@ -0,0 +1,117 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+# Diário de estado: arquivo append-only mapeado em memória com as transições do
+# relógio e da tabela de recursos de um processo.
+#
+# Cada registro é [tamanho:u32][crc32:u32][json], com as variáveis alteradas e
+# seus novos valores. A recuperação aplica os registros em ordem até o primeiro
+# registro vazio ou corrompido (escrita interrompida). Quando o número de
+# registros passa do limite, ou o arquivo enche, o diário é compactado em um
+# único registro com o estado consolidado e substituído atomicamente.
+
+CABECALHO = struct.Struct("<II")
+CAPACIDADE_PADRAO = 1 << 20  # 1 MiB
+COMPACTAR_A_CADA = 10000  # Registros entre compactações
+
+
+class Diario:
+    def __init__(self, caminho: str, capacidade=CAPACIDADE_PADRAO, compactar_a_cada=COMPACTAR_A_CADA, sincronizar=False):
+        self.caminho = caminho
+        self.capacidade = capacidade
+        self.compactar_a_cada = compactar_a_cada
+        self.sincronizar = sincronizar  # msync a cada registro (sobrevive a queda da máquina)
+        self.estado = {}
+        self.registros = 0
+        self.posicao = 0
+        self.arquivo = None
+        self.mapa = None
+        self.lock = threading.Lock()  # Registros podem vir de threads diferentes
+        self.abrir()
+
+    # Abre (ou cria) o arquivo com pelo menos a capacidade configurada
+    def abrir(self):
+        self.arquivo = open(self.caminho, "a+b")
+        tamanho = os.fstat(self.arquivo.fileno()).st_size
+        if tamanho < self.capacidade:
+            self.arquivo.truncate(self.capacidade)
+        else:
+            self.capacidade = tamanho
+        self.mapa = mmap.mmap(self.arquivo.fileno(), self.capacidade)
+
+    def fechar(self):
+        self.mapa.flush()
+        self.mapa.close()
+        self.arquivo.close()
+
+    # Lê os registros válidos e retorna o estado consolidado
+    def recuperar(self):
+        self.estado = {}
+        self.registros = 0
+        posicao = 0
+        while posicao + CABECALHO.size <= self.capacidade:
+            tamanho, crc = CABECALHO.unpack_from(self.mapa, posicao)
+            inicio = posicao + CABECALHO.size
+            if tamanho == 0 or inicio + tamanho > self.capacidade:
+                break
+            dados = self.mapa[inicio : inicio + tamanho]
+            if zlib.crc32(dados) != crc:
+                break  # Registro parcialmente escrito
+            self.estado.update(json.loads(dados))
+            self.registros += 1
+            posicao = inicio + tamanho
+        self.posicao = posicao
+        # Descarta qualquer resto de um registro interrompido
+        if posicao + CABECALHO.size <= self.capacidade:
+            CABECALHO.pack_into(self.mapa, posicao, 0, 0)
+        return dict(self.estado)
+
+    # Acrescenta uma transição ao diário
+    def registrar(self, alteracoes: dict):
+        with self.lock:
+            self.estado.update(alteracoes)
+            dados = json.dumps(alteracoes, separators=(",", ":")).encode()
+            if self.registros >= self.compactar_a_cada or not self.cabe(dados):
+                self.compactar()
+                return
+            self.escrever(dados)
+
+    def cabe(self, dados):
+        # Mantém espaço para o marcador de fim após o registro
+        return self.posicao + 2 * CABECALHO.size + len(dados) <= self.capacidade
+
+    def escrever(self, dados):
+        inicio = self.posicao + CABECALHO.size
+        self.mapa[inicio : inicio + len(dados)] = dados
+        CABECALHO.pack_into(self.mapa, inicio + len(dados), 0, 0)
+        # O cabeçalho é escrito por último para que o registro só valha completo
+        CABECALHO.pack_into(self.mapa, self.posicao, len(dados), zlib.crc32(dados))
+        if self.sincronizar:
+            self.mapa.flush()
+        self.posicao = inicio + len(dados)
+        self.registros += 1
+
+    # Reescreve o diário com um único registro contendo o estado consolidado
+    def compactar(self):
+        dados = json.dumps(self.estado, separators=(",", ":")).encode()
+        while 2 * (len(dados) + 2 * CABECALHO.size) > self.capacidade:
+            self.capacidade *= 2
+
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "wb") as f:
+            f.truncate(self.capacidade)
+            f.write(CABECALHO.pack(len(dados), zlib.crc32(dados)))
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        self.mapa.close()
+        self.arquivo.close()
+        os.replace(temporario, self.caminho)
+
+        self.abrir()
+        self.posicao = CABECALHO.size + len(dados)
+        self.registros = 1
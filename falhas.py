@@ -0,0 +1,156 @@
+import json
+import random
+import socket
+import threading
+import time
+
+# Injeção de falhas de rede: um proxy local por enlace dirigido (origem -> destino).
+#
+# O cluster aponta PROCESSOS[destino] da origem para a porta do proxy, que lê o
+# quadro inteiro e o entrega ao destino real depois de aplicar latência, jitter,
+# limite de banda, perda, reordenação e partição. Cenários são listas de fases
+# aplicadas ao longo do teste de carga pelo cluster.py.
+
+PARAMETROS_PADRAO = {
+    "latencia": 0.0,  # Atraso fixo (s)
+    "jitter": 0.0,  # Variação uniforme adicional (s)
+    "banda": 0,  # Bytes por segundo (0 = ilimitada)
+    "perda": 0.0,  # Probabilidade de descartar um quadro
+    "reordenacao": 0.0,  # Probabilidade de atrasar um quadro para que outros o ultrapassem
+    "atraso_reordenacao": 0.01,  # Atraso extra dos quadros reordenados (s)
+}
+
+
+class ProxyFalhas:
+    def __init__(self, origem: str, destino: str, escuta, alvo):
+        self.origem = origem
+        self.destino = destino
+        self.escuta = escuta
+        self.alvo = alvo
+        self.parametros = dict(PARAMETROS_PADRAO)
+        self.particionado = False
+        self.livre_em = 0.0  # Fim da transmissão do último quadro (limite de banda)
+        self.estatisticas = {"quadros": 0, "entregues": 0, "descartados": 0, "bytes": 0}
+        self.lock = threading.Lock()
+
+    def iniciar(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(self.escuta)
+        server.listen(128)
+        threading.Thread(target=self.aceitar, args=(server,), daemon=True).start()
+
+    def configurar(self, **parametros):
+        with self.lock:
+            self.parametros.update(parametros)
+
+    def aceitar(self, server):
+        while True:
+            conn, addr = server.accept()
+            with conn:
+                partes = []
+                while parte := conn.recv(4096):
+                    partes.append(parte)
+            if partes:
+                self.encaminhar(b"".join(partes))
+
+    # Decide o destino do quadro: descarte ou entrega após o atraso calculado
+    def encaminhar(self, dados: bytes):
+        with self.lock:
+            p = self.parametros
+            self.estatisticas["quadros"] += 1
+            self.estatisticas["bytes"] += len(dados)
+            if self.particionado or random.random() < p["perda"]:
+                self.estatisticas["descartados"] += 1
+                return
+            agora = time.monotonic()
+            if p["banda"]:
+                self.livre_em = max(agora, self.livre_em) + len(dados) / p["banda"]
+                atraso = self.livre_em - agora
+            else:
+                atraso = 0.0
+            atraso += p["latencia"] + random.uniform(0, p["jitter"])
+            if random.random() < p["reordenacao"]:
+                atraso += p["atraso_reordenacao"]
+        if atraso > 0:
+            threading.Timer(atraso, self.entregar, args=(dados,)).start()
+        else:
+            self.entregar(dados)
+
+    def entregar(self, dados: bytes):
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.connect(self.alvo)
+                s.sendall(dados)
+        except Exception as e:
+            print(f"Erro no proxy {self.origem}->{self.destino}: {e}")
+            return
+        with self.lock:
+            self.estatisticas["entregues"] += 1
+
+
+# Cria um proxy para cada par ordenado de processos
+def montar_proxies(processos, porta_base: int):
+    proxies = {}
+    for origem in processos:
+        for destino, alvo in processos.items():
+            if origem != destino:
+                escuta = (alvo[0], porta_base + len(proxies))
+                proxies[(origem, destino)] = ProxyFalhas(origem, destino, escuta, alvo)
+    return proxies
+
+
+# Mapa PROCESSOS visto por cada origem, com os destinos passando pelos proxies
+def montar_rotas(processos, proxies):
+    return {
+        origem: {
+            destino: alvo if origem == destino else proxies[(origem, destino)].escuta
+            for destino, alvo in processos.items()
+        }
+        for origem in processos
+    }
+
+
+# Enlaces afetados por uma fase: "*" ou lista de pares (nos dois sentidos)
+def selecionar_enlaces(proxies, enlaces):
+    if enlaces in (None, "*"):
+        return list(proxies.values())
+    pares = {tuple(par) for par in enlaces} | {tuple(reversed(par)) for par in enlaces}
+    return [proxy for chave, proxy in proxies.items() if chave in pares]
+
+
+# Aplica uma fase do cenário
+def aplicar_fase(proxies, fase):
+    parametros = {k: v for k, v in fase.items() if k in PARAMETROS_PADRAO}
+    if parametros:
+        for proxy in selecionar_enlaces(proxies, fase.get("enlaces")):
+            proxy.configurar(**parametros)
+    if "particao" in fase:
+        # Só os enlaces entre lados diferentes caem; processos fora da lista seguem ligados a todos
+        lado = {processo: i for i, grupo in enumerate(fase["particao"] or []) for processo in grupo}
+        for (origem, destino), proxy in proxies.items():
+            proxy.particionado = origem in lado and destino in lado and lado[origem] != lado[destino]
+
+
+# Executa as fases do cenário nos instantes indicados (relativos ao início da carga)
+def executar_cenario(proxies, cenario):
+    inicio = time.monotonic()
+    for fase in sorted(cenario.get("fases", []), key=lambda f: f.get("inicio", 0)):
+        espera = inicio + fase.get("inicio", 0) - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+        aplicar_fase(proxies, fase)
+
+
+def carregar_cenario(caminho: str):
+    with open(caminho) as f:
+        return json.load(f)
+
+
+# Totais de quadros entregues e descartados em todos os enlaces
+def resumir_estatisticas(proxies):
+    total = {"quadros": 0, "entregues": 0, "descartados": 0, "bytes": 0}
+    for proxy in proxies.values():
+        for chave in total:
+            total[chave] += proxy.estatisticas[chave]
+    return total
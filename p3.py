@@ -3,6 +3,8 @@ import socket
 import threading
 import time
 
+from diario import Diario
+
 # Cores para mensagens do terminal
 RED = "\033[31m"
 GREEN = "\033[32m"
@@ -19,7 +21,7 @@ Digite {UNDERLINE}sair{R} para encerrar o processo"""
 AUTOMATIC_TEST = f"{GREEN}Inicializando teste automático...{R}"
 DEBUG_MESSAGE_TYPE = "\n{}DEBUG: Mensagem do tipo {} enviada para {}.{}"
 DEBUG_FILA = (
-    "{}DEBUG: {} adicionado à fila de espera para {}\n[recurso_ocupado = {}, {} > {}]{}"
+    "{}DEBUG: {} adicionado à fila de espera para {}\n[recurso_ocupado = {}, {} < {}]{}"
 )
 
 
@@ -32,10 +34,17 @@ PROCESSOS = {
     "p2": ("localhost", 8002),
     "p3": ("localhost", 8003),
 }
+GRUPOS = {}  # Modo hierárquico: {"grupo": [processos]}, o primeiro é o representante
+ARQUIVO_DIARIO = "estado_{}.diario"  # Diário de estado para recuperação após reinício
+RESERVA_RELOGIO = 1000  # Timestamps reservados no diário por registro do relógio
 
 # Modo de debug
 debug_mode = True
 teste_ativo = False
+modo_interativo = True  # False para uso programático (ex.: gerador de carga)
+janela_envio = 0.0  # Segundos para agrupar mensagens por destino (0 = envio imediato)
+tempo_retransmissao = 1.0  # Segundos sem resposta até reenviar requisições (0 = nunca)
+TIPOS_IMEDIATOS = ("requisicao", "requisicao_global", "pedido_global", "concessao_global", "liberacao_global")
 
 # Estado local
 recurso_ocupado = False
@@ -43,67 +52,358 @@ fila_recurso = []
 respostas_esperadas = {}  # {"recurso": set(de processos aguardando resposta)}
 relogio_local = 0
 esperando_recurso = None
+timestamp_requisicao = 0  # Timestamp da requisição pendente deste processo
+limite_relogio = 0  # Maior timestamp já reservado no diário
+diario = None  # Ativado por iniciar_diario()
+tempo_recuperacao = None  # Milissegundos gastos na última recuperação do diário
+
+# Estado do segundo nível (modo hierárquico)
+recurso_global = None  # Recurso concedido a este processo entre grupos
+recurso_global_ocupado = False  # Representante: algum membro do grupo detém o recurso
+esperando_global = None  # Representante: recurso disputado entre grupos
+timestamp_global = 0
+solicitante_global = None  # Membro em nome de quem o representante disputa
+timestamp_pedido_global = 0  # Representante: timestamp do último pedido aceito no grupo
+timestamp_pedido = 0  # Membro: timestamp do pedido ao representante em andamento
+fila_global = []
+respostas_globais = {}  # {"recurso": set(de representantes aguardando resposta)}
+
+# Fila de envio por destino e contadores de agrupamento
+filas_envio = {}  # {"destino": [mensagens aguardando o próximo quadro]}
+sinais_envio = {}  # {"destino": Condition da thread de envio do destino}
+urgentes = set()  # Destinos cuja fila deve sair sem esperar o fim da janela
+mensagens_enviadas = 0
+quadros_enviados = 0
+mensagens_entre_grupos = 0
 
 # Gerenciamento de threads
 lock = threading.Lock()
 cond_fila = threading.Condition(lock)
+lock_envio = threading.Lock()
+lock_prompt = threading.Lock()
 
 # Função de atualização de relógio
 def atualizar_relogio(timestamp_recebido):
     global relogio_local
     relogio_local = max(relogio_local, int(timestamp_recebido)) + 1
+    reservar_relogio()
+
+# Reserva blocos de timestamps no diário para nunca reutilizá-los após um reinício
+def reservar_relogio():
+    global limite_relogio
+    if diario is not None and relogio_local >= limite_relogio:
+        limite_relogio = relogio_local + RESERVA_RELOGIO
+        diario.registrar({"limite_relogio": limite_relogio})
+
+# Registra no diário o valor atual das variáveis de estado indicadas
+def registrar_estado(*campos):
+    if diario is None:
+        return
+    alteracoes = {}
+    for campo in campos:
+        valor = globals()[campo]
+        if campo in ("respostas_esperadas", "respostas_globais"):
+            valor = {recurso: sorted(pendentes) for recurso, pendentes in valor.items()}
+        alteracoes[campo] = valor
+    diario.registrar(alteracoes)
+
+# Abre o diário e restaura relógio, recursos mantidos e requisições adiadas
+def iniciar_diario(caminho=None):
+    global diario, relogio_local, limite_relogio, recurso_ocupado, esperando_recurso
+    global timestamp_requisicao, fila_recurso, respostas_esperadas
+    global recurso_global_ocupado, esperando_global, timestamp_global, solicitante_global
+    global fila_global, respostas_globais, timestamp_pedido_global, tempo_recuperacao
+    global recurso_global, timestamp_pedido
+    inicio = time.perf_counter()
+    diario = Diario(caminho or ARQUIVO_DIARIO.format(ID_PROCESSO))
+    estado = diario.recuperar()
+    relogio_local = limite_relogio = estado.get("limite_relogio", 0)
+    recurso_ocupado = estado.get("recurso_ocupado", False)
+    esperando_recurso = estado.get("esperando_recurso")
+    timestamp_requisicao = estado.get("timestamp_requisicao", 0)
+    fila_recurso = estado.get("fila_recurso", [])
+    respostas_esperadas = {
+        recurso: set(pendentes)
+        for recurso, pendentes in estado.get("respostas_esperadas", {}).items()
+    }
+    recurso_global_ocupado = estado.get("recurso_global_ocupado", False)
+    esperando_global = estado.get("esperando_global")
+    timestamp_global = estado.get("timestamp_global", 0)
+    solicitante_global = estado.get("solicitante_global")
+    timestamp_pedido_global = estado.get("timestamp_pedido_global", 0)
+    fila_global = estado.get("fila_global", [])
+    respostas_globais = {
+        recurso: set(pendentes)
+        for recurso, pendentes in estado.get("respostas_globais", {}).items()
+    }
+    recurso_global = estado.get("recurso_global")
+    timestamp_pedido = estado.get("timestamp_pedido", 0)
+    reservar_relogio()
+    tempo_recuperacao = 1000 * (time.perf_counter() - inicio)
+    if debug_mode:
+        print(
+            f"{BLUE}DEBUG: Estado recuperado em {tempo_recuperacao:.2f} ms "
+            f"[relogio = {relogio_local}, recurso_ocupado = {recurso_ocupado}, "
+            f"fila = {len(fila_recurso)}]{R}"
+        )
+
+# Após um reinício, descarta a requisição interrompida (ninguém mais aguarda por ela)
+# e responde às requisições adiadas; um recurso já mantido segue até ser liberado
+def retomar_requisicao():
+    global esperando_recurso, fila_recurso
+    with cond_fila:
+        if esperando_global is not None:
+            if solicitante_global != ID_PROCESSO:
+                retransmitir_global(esperando_global)  # O membro solicitante continua aguardando
+            elif not recurso_ocupado:
+                encerrar_global(esperando_global)  # Disputa própria interrompida
+        if recurso_ocupado:
+            if modo_interativo:
+                print(f"Recurso {esperando_recurso} mantido antes do reinício. Digite liberar {esperando_recurso} para liberá-lo.")
+            return
+        if esperando_recurso is None:
+            return
+        recurso = esperando_recurso
+        esperando_recurso = None
+        respostas_esperadas.pop(recurso, None)
+        adiadas = [r for r in fila_recurso if r["recurso"] == recurso]
+        fila_recurso = [r for r in fila_recurso if r["recurso"] != recurso]
+        for requisicao in adiadas:
+            enviar_ack(requisicao["id"], recurso, requisicao["timestamp"], imediato=True)
+        if GRUPOS and timestamp_pedido:
+            liberar_global(recurso)  # Devolve ao representante o pedido (ou a concessão) pendente
+        registrar_estado("esperando_recurso", "respostas_esperadas", "fila_recurso")
+
+# Reenvia a requisição pendente (mesmo timestamp) a quem ainda não respondeu
+def retransmitir_requisicao(recurso):
+    mensagem = {
+        "tipo": "requisicao",
+        "recurso": recurso,
+        "timestamp": timestamp_requisicao,
+        "id": ID_PROCESSO,
+    }
+    for destino in sorted(respostas_esperadas.get(recurso, ())):
+        enviar_mensagem(destino, mensagem)
 
-# Função para envio de mensagens
-def enviar_mensagem(destino: str, mensagem):
+# Função para envio de mensagens; imediato=True dispensa a janela de agrupamento
+def enviar_mensagem(destino: str, mensagem, imediato=False):
+    if janela_envio <= 0:
+        enviar_quadro(destino, [mensagem])
+        return
+    with lock_envio:
+        filas_envio.setdefault(destino, []).append(mensagem)
+        if imediato or mensagem["tipo"] in TIPOS_IMEDIATOS:
+            # Segue agora, levando de carona as respostas pendentes para o destino
+            urgentes.add(destino)
+        if destino not in sinais_envio:
+            sinais_envio[destino] = threading.Condition(lock_envio)
+            threading.Thread(target=remetente_fila, args=(destino,), daemon=True).start()
+        sinais_envio[destino].notify()
+
+# Thread de envio de um destino: junta em um quadro o que chegar dentro da janela
+def remetente_fila(destino: str):
+    with lock_envio:
+        sinal = sinais_envio[destino]
+    while True:
+        with sinal:
+            while not filas_envio.get(destino):
+                sinal.wait()
+            prazo = time.monotonic() + janela_envio
+            while destino not in urgentes and prazo > time.monotonic():
+                sinal.wait(prazo - time.monotonic())
+            urgentes.discard(destino)
+            mensagens = filas_envio.pop(destino)
+        enviar_quadro(destino, mensagens)
+
+# Envia um quadro (uma conexão) com uma ou mais mensagens
+def enviar_quadro(destino: str, mensagens):
+    global mensagens_enviadas, quadros_enviados, mensagens_entre_grupos
     host, port = PROCESSOS[destino]
+    quadro = mensagens[0] if len(mensagens) == 1 else mensagens
     try:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.connect((host, port))
-            s.sendall(json.dumps(mensagem).encode())
+            s.sendall(json.dumps(quadro).encode())
             if debug_mode:
-                print(DEBUG_MESSAGE_TYPE.format(YELLOW, mensagem["tipo"], destino, R))
+                for mensagem in mensagens:
+                    print(DEBUG_MESSAGE_TYPE.format(YELLOW, mensagem["tipo"], destino, R))
     except Exception as e:
         print(f"Erro ao enviar mensagem para {destino}: {e}")
+        return
+    with lock_envio:
+        mensagens_enviadas += len(mensagens)
+        quadros_enviados += 1
+        if GRUPOS and grupo_de(destino) != grupo_de(ID_PROCESSO):
+            mensagens_entre_grupos += len(mensagens)
 
 # Multicast para requisitar acesso ao recurso
 def multicast_requisicao(recurso: str):
-    global relogio_local, respostas_esperadas
+    global relogio_local, respostas_esperadas, timestamp_requisicao
     relogio_local += 1
+    timestamp_requisicao = relogio_local
     mensagem = {
         "tipo": "requisicao",
         "recurso": recurso,
         "timestamp": relogio_local,
         "id": ID_PROCESSO,
     }
-    respostas_esperadas[recurso] = set(PROCESSOS.keys()) - {ID_PROCESSO}
-    for destino in PROCESSOS:
-        if destino != ID_PROCESSO:
-            enviar_mensagem(destino, mensagem)
+    respostas_esperadas[recurso] = pares_locais()
+    reservar_relogio()
+    registrar_estado("esperando_recurso", "timestamp_requisicao", "respostas_esperadas")
+    for destino in sorted(respostas_esperadas[recurso]):
+        enviar_mensagem(destino, mensagem)
 
-# Enviar resposta (ACK) para requisições recebidas
-def enviar_ack(destino, recurso):
+# Enviar resposta (ACK) para requisições recebidas; ref é o timestamp da requisição
+def enviar_ack(destino, recurso, ref, imediato=False):
     global relogio_local
     relogio_local += 1
+    reservar_relogio()
     mensagem = {
         "tipo": "ack",
         "recurso": recurso,
         "timestamp": relogio_local,
         "id": ID_PROCESSO,
+        "ref": ref,
     }
-    enviar_mensagem(destino, mensagem)
+    enviar_mensagem(destino, mensagem, imediato)
 
 # Enviar resposta (NACK) para requisições recebidas
-def enviar_nack(destino, recurso):
+def enviar_nack(destino, recurso, ref):
     global relogio_local
     relogio_local += 1
+    reservar_relogio()
     mensagem = {
         "tipo": "nack",
         "recurso": recurso,
         "timestamp": relogio_local,
         "id": ID_PROCESSO,
+        "ref": ref,
     }
     enviar_mensagem(destino, mensagem)
 
+# Grupo ao qual um processo pertence (modo hierárquico)
+def grupo_de(processo):
+    for grupo, membros in GRUPOS.items():
+        if processo in membros:
+            return grupo
+
+# Representante do grupo deste processo
+def representante_local():
+    return GRUPOS[grupo_de(ID_PROCESSO)][0]
+
+# Processos com quem este processo disputa o primeiro nível
+def pares_locais():
+    if GRUPOS:
+        return set(GRUPOS[grupo_de(ID_PROCESSO)]) - {ID_PROCESSO}
+    return set(PROCESSOS.keys()) - {ID_PROCESSO}
+
+# Representantes dos outros grupos (segundo nível)
+def representantes_remotos():
+    return {membros[0] for membros in GRUPOS.values()} - {ID_PROCESSO}
+
+# Enviar mensagem do segundo nível (pedido, concessão, liberação e ACK entre grupos)
+def enviar_global(destino, tipo, recurso, ref=None, imediato=False):
+    global relogio_local
+    relogio_local += 1
+    reservar_relogio()
+    mensagem = {
+        "tipo": tipo,
+        "recurso": recurso,
+        "timestamp": relogio_local,
+        "id": ID_PROCESSO,
+        "ref": ref,
+    }
+    enviar_mensagem(destino, mensagem, imediato)
+    return mensagem
+
+# Representante: disputa o recurso entre grupos em nome de um membro
+def iniciar_global(recurso, solicitante, pedido=None):
+    global relogio_local, esperando_global, timestamp_global, solicitante_global
+    global timestamp_pedido_global
+    if esperando_global is not None:
+        # Novo pedido com o recurso ainda preso: a liberação anterior se perdeu
+        encerrar_global(esperando_global)
+    relogio_local += 1
+    reservar_relogio()
+    esperando_global = recurso
+    timestamp_global = relogio_local
+    solicitante_global = solicitante
+    timestamp_pedido_global = timestamp_global if pedido is None else pedido
+    respostas_globais[recurso] = representantes_remotos()
+    registrar_estado(
+        "esperando_global",
+        "timestamp_global",
+        "solicitante_global",
+        "timestamp_pedido_global",
+        "respostas_globais",
+    )
+    retransmitir_global(recurso)
+    if not respostas_globais[recurso]:
+        conceder_global(recurso)
+
+# Representante: envia (ou reenvia) a requisição aos grupos que ainda não responderam
+def retransmitir_global(recurso):
+    mensagem = {
+        "tipo": "requisicao_global",
+        "recurso": recurso,
+        "timestamp": timestamp_global,
+        "id": ID_PROCESSO,
+    }
+    for destino in sorted(respostas_globais.get(recurso, ())):
+        enviar_mensagem(destino, mensagem)
+
+# Representante: todos os grupos responderam, concede ao membro solicitante
+def conceder_global(recurso):
+    global recurso_global_ocupado, recurso_global
+    recurso_global_ocupado = True
+    registrar_estado("recurso_global_ocupado")
+    if solicitante_global == ID_PROCESSO:
+        recurso_global = recurso
+        cond_fila.notify_all()
+    else:
+        enviar_global(solicitante_global, "concessao_global", recurso, timestamp_pedido_global)
+
+# Representante: libera o recurso entre grupos e responde aos grupos adiados
+def encerrar_global(recurso):
+    global recurso_global_ocupado, esperando_global, solicitante_global, fila_global
+    recurso_global_ocupado = False
+    esperando_global = solicitante_global = None
+    adiadas = [r for r in fila_global if r["recurso"] == recurso]
+    fila_global = [r for r in fila_global if r["recurso"] != recurso]
+    for requisicao in adiadas:
+        enviar_global(requisicao["id"], "ack_global", recurso, requisicao["timestamp"], imediato=True)
+    registrar_estado("recurso_global_ocupado", "esperando_global", "solicitante_global", "fila_global")
+
+# Segundo nível para quem venceu o primeiro (chamado com cond_fila adquirido)
+def adquirir_global(recurso):
+    global timestamp_pedido
+    if representante_local() == ID_PROCESSO:
+        iniciar_global(recurso, ID_PROCESSO)
+        while recurso_global != recurso:
+            if not cond_fila.wait(tempo_retransmissao or None):
+                retransmitir_global(recurso)
+        registrar_estado("recurso_global")
+        return
+    pedido = enviar_global(representante_local(), "pedido_global", recurso)
+    timestamp_pedido = pedido["timestamp"]
+    registrar_estado("timestamp_pedido")
+    while recurso_global != recurso:
+        # Acordado pela concessão do representante; reenvia o pedido se ela não chegar
+        if not cond_fila.wait(tempo_retransmissao or None):
+            enviar_mensagem(representante_local(), pedido)
+    registrar_estado("recurso_global")
+
+# Devolve o recurso ao segundo nível (chamado com cond_fila adquirido)
+def liberar_global(recurso):
+    global recurso_global, timestamp_pedido
+    recurso_global = None
+    if representante_local() == ID_PROCESSO:
+        encerrar_global(recurso)
+    else:
+        enviar_global(representante_local(), "liberacao_global", recurso, timestamp_pedido)
+        timestamp_pedido = 0
+    registrar_estado("recurso_global", "timestamp_pedido")
+
 # Função para o processo de aguardar liberação do recurso
 def aguardar_recurso(recurso):
     global recurso_ocupado, esperando_recurso
@@ -130,69 +430,75 @@ def entrar_recurso_critico(recurso: str):
         return
 
     print(f"Requisitando acesso ao {recurso}...")
-    esperando_recurso = recurso
     if teste_ativo:
         time.sleep(2)  # Simula atraso na requisição
-    multicast_requisicao(recurso)
-    while respostas_esperadas[recurso]:
-        time.sleep(0.1)  # Aguarda receber todos os ACKs
-    recurso_ocupado = True
+    with cond_fila:
+        esperando_recurso = recurso
+        multicast_requisicao(recurso)
+        while respostas_esperadas[recurso]:
+            # Acordado a cada ACK recebido; reenvia a requisição a quem não respondeu
+            # (ex.: um processo que estava fora do ar e foi reiniciado)
+            if not cond_fila.wait(tempo_retransmissao or None):
+                retransmitir_requisicao(recurso)
+        if GRUPOS:
+            adquirir_global(recurso)
+        recurso_ocupado = True
+        registrar_estado("recurso_ocupado")
     print(f"Acesso concedido ao {recurso}! \n")
 
 # Sair do recurso crítico
 def sair_recurso_critico(recurso):
     global recurso_ocupado, esperando_recurso, fila_recurso
 
-    if recurso_ocupado and esperando_recurso == recurso:
+    with cond_fila:
+        if recurso_ocupado and esperando_recurso == recurso:
+            recurso_ocupado = False
+            esperando_recurso = None
+            if GRUPOS:
+                liberar_global(recurso)
+            print(f"Recurso {recurso} liberado.")
+
+            # Notifica o próximo processo na fila
+            if fila_recurso:
+                requisicao = fila_recurso.pop(0)  # Retira o primeiro processo da fila
+                enviar_ack(requisicao["id"], recurso, requisicao["timestamp"], imediato=True)
+                print(f"Processo {requisicao['id']} recebeu o recurso {recurso}.")
+            # Reset fila após processar
+            fila_recurso.clear()
+            registrar_estado("recurso_ocupado", "esperando_recurso", "fila_recurso")
+
+# Acesso programático ao recurso crítico (sem prompts), usado pelo gerador de carga
+def adquirir_recurso(recurso: str):
+    global recurso_ocupado, esperando_recurso
+    with cond_fila:
+        esperando_recurso = recurso
+        multicast_requisicao(recurso)
+        while respostas_esperadas[recurso]:
+            # Acordado a cada ACK recebido; reenvia a requisição se as respostas não chegarem
+            if not cond_fila.wait(tempo_retransmissao or None):
+                retransmitir_requisicao(recurso)
+        if GRUPOS:
+            adquirir_global(recurso)
+        recurso_ocupado = True
+        registrar_estado("recurso_ocupado")
+
+# Liberação programática: responde a todas as requisições adiadas para o recurso
+def liberar_recurso(recurso: str):
+    global recurso_ocupado, esperando_recurso, fila_recurso
+    with cond_fila:
+        if GRUPOS:
+            liberar_global(recurso)
         recurso_ocupado = False
         esperando_recurso = None
-        print(f"Recurso {recurso} liberado.")
-
-        # Notifica o próximo processo na fila
-        if fila_recurso:
-            requisicao = fila_recurso.pop(0)  # Retira o primeiro processo da fila
-            enviar_ack(requisicao["id"], recurso)
-            print(f"Processo {requisicao['id']} recebeu o recurso {recurso}.")
-        # Reset fila após processar
-        fila_recurso.clear()
+        adiadas = [r for r in fila_recurso if r["recurso"] == recurso]
+        fila_recurso = [r for r in fila_recurso if r["recurso"] != recurso]
+        for requisicao in adiadas:
+            enviar_ack(requisicao["id"], recurso, requisicao["timestamp"], imediato=True)
+        registrar_estado("recurso_ocupado", "esperando_recurso", "fila_recurso")
 
-# Processar mensagens recebidas
-def processar_mensagem(mensagem):
-    global relogio_local, fila_recurso, respostas_esperadas
-    tipo = mensagem["tipo"]
-    recurso = mensagem["recurso"]
-    remetente = mensagem["id"]
-    timestamp = mensagem["timestamp"]
-
-    atualizar_relogio(timestamp)
-
-    if tipo == "requisicao":
-        # Recurso ocupado ou prioridade do remetente maior
-        if recurso_ocupado or (
-            esperando_recurso == recurso
-            and (relogio_local, ID_PROCESSO) > (timestamp, remetente)
-        ):
-            fila_recurso.append(mensagem)
-            if debug_mode:
-                print(
-                    DEBUG_FILA.format(
-                        YELLOW,
-                        remetente,
-                        recurso,
-                        recurso_ocupado,
-                        (relogio_local, ID_PROCESSO),
-                        (timestamp, remetente),
-                        R,
-                    )
-                )
-            # Enviar NACK se o recurso está ocupado
-            enviar_nack(remetente, recurso)
-        else:
-            enviar_ack(remetente, recurso)
-    elif tipo == "ack":
-        if recurso in respostas_esperadas:
-            respostas_esperadas[recurso].discard(remetente)
-    elif tipo == "nack":
+# Pergunta ao usuário o que fazer após um NACK (um prompt por vez)
+def tratar_nack(recurso, remetente):
+    with lock_prompt:
         print(f"Recurso {recurso} ocupado. Processando NACK de {remetente}.")
         print("O que deseja fazer?")
         print("1. Esperar o recurso ser liberado")
@@ -203,20 +509,128 @@ def processar_mensagem(mensagem):
             threading.Thread(target=aguardar_recurso, args=(recurso,), daemon=True).start()
         else:
             print(f"Você optou por desistir do recurso {recurso}.")
-        return
+
+# Processar mensagens recebidas
+def processar_mensagem(mensagem):
+    global relogio_local, fila_recurso, respostas_esperadas, fila_global, recurso_global
+    global timestamp_pedido
+    with cond_fila:
+        tipo = mensagem["tipo"]
+        recurso = mensagem["recurso"]
+        remetente = mensagem["id"]
+        timestamp = mensagem["timestamp"]
+
+        atualizar_relogio(timestamp)
+
+        if tipo == "requisicao":
+            # Requisição reenviada após reinício do remetente e já adiada
+            if mensagem in fila_recurso:
+                return
+            # Recurso ocupado ou requisição local com prioridade sobre a do remetente
+            # (esperando_recurso continua definido enquanto o recurso é mantido)
+            if esperando_recurso == recurso and (
+                recurso_ocupado
+                or (timestamp_requisicao, ID_PROCESSO) < (timestamp, remetente)
+            ):
+                fila_recurso.append(mensagem)
+                registrar_estado("fila_recurso")
+                if debug_mode:
+                    print(
+                        DEBUG_FILA.format(
+                            YELLOW,
+                            remetente,
+                            recurso,
+                            recurso_ocupado,
+                            (timestamp_requisicao, ID_PROCESSO),
+                            (timestamp, remetente),
+                            R,
+                        )
+                    )
+                # Enviar NACK se o recurso está ocupado (no modo programático a resposta
+                # é apenas adiada até a liberação)
+                if modo_interativo:
+                    enviar_nack(remetente, recurso, timestamp)
+            else:
+                enviar_ack(remetente, recurso, timestamp)
+        elif tipo == "ack":
+            # ACKs de requisições anteriores (reenvios ou atrasos na rede) são ignorados
+            if recurso in respostas_esperadas and mensagem.get("ref", timestamp_requisicao) == timestamp_requisicao:
+                respostas_esperadas[recurso].discard(remetente)
+                registrar_estado("respostas_esperadas")
+                cond_fila.notify_all()
+        elif tipo == "nack":
+            # Assim como os ACKs, NACKs de requisições anteriores são ignorados
+            if modo_interativo and mensagem.get("ref", timestamp_requisicao) == timestamp_requisicao:
+                # O prompt roda em outra thread, fora do lock, para não parar o servidor
+                threading.Thread(target=tratar_nack, args=(recurso, remetente), daemon=True).start()
+        elif tipo == "pedido_global":
+            # Pedidos do mesmo grupo têm timestamps crescentes; menores são atrasados
+            if timestamp < timestamp_pedido_global:
+                return
+            if timestamp == timestamp_pedido_global:
+                # Pedido reenviado: repete a concessão ou a disputa pendente
+                if solicitante_global == remetente:
+                    if recurso_global_ocupado:
+                        enviar_global(remetente, "concessao_global", recurso, timestamp)
+                    else:
+                        retransmitir_global(recurso)
+                return
+            iniciar_global(recurso, remetente, timestamp)
+        elif tipo == "requisicao_global":
+            if mensagem in fila_global:
+                # Outro grupo reenviou: a liberação do membro pode ter se perdido.
+                # Repetir a concessão faz o membro confirmar o uso ou devolver o recurso
+                if recurso_global_ocupado and solicitante_global not in (None, ID_PROCESSO):
+                    enviar_global(solicitante_global, "concessao_global", esperando_global, timestamp_pedido_global)
+                return
+            # Grupo local detém o recurso ou tem prioridade sobre o grupo remetente
+            if esperando_global == recurso and (
+                recurso_global_ocupado
+                or (timestamp_global, ID_PROCESSO) < (timestamp, remetente)
+            ):
+                fila_global.append(mensagem)
+                registrar_estado("fila_global")
+            else:
+                enviar_global(remetente, "ack_global", recurso, timestamp)
+        elif tipo == "ack_global":
+            if (
+                esperando_global == recurso
+                and mensagem.get("ref", timestamp_global) == timestamp_global
+                and remetente in respostas_globais[recurso]
+            ):
+                respostas_globais[recurso].discard(remetente)
+                registrar_estado("respostas_globais")
+                if not respostas_globais[recurso]:
+                    conceder_global(recurso)
+        elif tipo == "concessao_global":
+            if timestamp_pedido and mensagem.get("ref") == timestamp_pedido:
+                # Concessão nova, ou repetida enquanto o recurso ainda está em uso
+                recurso_global = recurso
+                cond_fila.notify_all()
+            else:
+                # Concessão de um pedido já liberado: devolve (de novo) o recurso
+                enviar_global(remetente, "liberacao_global", recurso, mensagem.get("ref"))
+        elif tipo == "liberacao_global":
+            if solicitante_global == remetente and mensagem.get("ref") == timestamp_pedido_global:
+                encerrar_global(recurso)
 
 # Thread para receber conexões
 def servidor():
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     server.bind((HOST, PORT))
-    server.listen(5)
+    server.listen(128)
     while True:
         conn, addr = server.accept()
         with conn:
-            data = conn.recv(1024)
-            if data:
-                mensagem = json.loads(data.decode())
-                processar_mensagem(mensagem)
+            partes = []
+            while parte := conn.recv(4096):
+                partes.append(parte)
+            if partes:
+                quadro = json.loads(b"".join(partes).decode())
+                # Um quadro pode trazer uma mensagem ou uma lista agrupada
+                for mensagem in quadro if isinstance(quadro, list) else [quadro]:
+                    processar_mensagem(mensagem)
 
 # Interface para comandos do usuário
 def interface_usuario():
@@ -247,7 +661,9 @@ def teste_automatico():
 
 # Inicialização
 if __name__ == "__main__":
+    iniciar_diario()
     threading.Thread(target=servidor, daemon=True).start()
+    retomar_requisicao()
 
     # Executa o teste automático
     # threading.Thread(target=teste_automatico).start()
@@ -0,0 +1,22 @@
+import pytest
+
+from carga import percentil, resumir_latencias
+
+
+def test_percentil_por_posicao():
+    ordenadas = list(range(1, 101))
+    assert percentil(ordenadas, 0) == 1
+    assert percentil(ordenadas, 50) == 51
+    assert percentil(ordenadas, 99) == 99
+    assert percentil(ordenadas, 100) == 100
+    assert percentil([7], 99) == 7
+    assert percentil([], 50) == 0.0
+
+
+def test_resumir_latencias_em_milissegundos():
+    resumo = resumir_latencias([0.004, 0.001, 0.003, 0.002])
+    assert resumo["media_ms"] == pytest.approx(2.5)
+    assert resumo["p50_ms"] == pytest.approx(3.0)
+    assert resumo["p99_ms"] == pytest.approx(4.0)
+    assert resumo["max_ms"] == pytest.approx(4.0)
+    assert resumir_latencias([]) == {"media_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
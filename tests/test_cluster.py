@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import carga
+import cluster
+from cluster import comparar_referencia, montar_grupos, montar_processos
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def relatorio(vazao, p99_ms):
+    return {"total": {"vazao": vazao, "p99_ms": p99_ms}}
+
+
+# Executa o cluster com uma seção crítica que conta quantos nós estão dentro dela
+def executar_verificando_exclusao(monkeypatch, argv):
+    contexto = multiprocessing.get_context("fork")
+    dentro = contexto.Value("i", 0)
+    violacoes = contexto.Value("i", 0)
+
+    def ciclo(no, recurso, duracao, tempo_secao, tempo_pensar):
+        latencias = []
+        fim = time.perf_counter() + duracao
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            no.adquirir_recurso(recurso)
+            latencias.append(time.perf_counter() - inicio)
+            with dentro.get_lock():
+                dentro.value += 1
+                if dentro.value > 1:
+                    violacoes.value += 1
+            time.sleep(0.0005)
+            with dentro.get_lock():
+                dentro.value -= 1
+            no.liberar_recurso(recurso)
+        return latencias
+
+    # Os nós são criados com fork e herdam o ciclo substituído
+    monkeypatch.setattr(carga, "ciclo_fechado", ciclo)
+    args = cluster.ler_argumentos(argv)
+    resultados, estatisticas_falhas = cluster.executar_cluster(args)
+    return cluster.montar_relatorio(resultados, args, estatisticas_falhas), violacoes.value
+
+
+def test_comparar_referencia():
+    base = relatorio(100.0, 10.0)
+    assert comparar_referencia(relatorio(80.0, 14.0), base, 0.5) == []
+    assert len(comparar_referencia(relatorio(40.0, 10.0), base, 0.5)) == 1
+    assert len(comparar_referencia(relatorio(100.0, 16.0), base, 0.5)) == 1
+    assert len(comparar_referencia(relatorio(40.0, 16.0), base, 0.5)) == 2
+
+
+def test_montar_grupos():
+    assert montar_grupos(montar_processos(4, 9001), 1) == {}
+    assert montar_grupos(montar_processos(5, 9001), 4) == {
+        "g1": ["p1", "p2"],
+        "g2": ["p3"],
+        "g3": ["p4"],
+        "g4": ["p5"],
+    }
+    grupos = montar_grupos(montar_processos(11, 9001), 3)
+    assert [len(membros) for membros in grupos.values()] == [4, 4, 3]
+    assert sum(grupos.values(), []) == list(montar_processos(11, 9001))
+
+
+# Modo hierárquico: dois grupos, com exclusão mútua verificada entre todos os nós
+def test_grupos_exclusao_mutua(monkeypatch):
+    relatorio, violacoes = executar_verificando_exclusao(
+        monkeypatch,
+        ["--nos", "4", "--grupos", "2", "--duracao", "2", "--porta-base", "12501", "--limite", "30"],
+    )
+    assert violacoes == 0
+    assert relatorio["configuracao"]["grupos"] == 2
+    assert all(processo["operacoes"] > 0 for processo in relatorio["processos"])
+    assert relatorio["total"]["entre_grupos_por_sc"] > 0
+
+
+# Execução curta do cluster com latência fixa nos enlaces, comparada à referência gravada
+def test_cenario_contra_referencia():
+    comando = [
+        sys.executable,
+        "cluster.py",
+        "--nos", "3",
+        "--duracao", "2",
+        "--porta-base", "12301",
+        "--cenario", os.path.join("cenarios", "latencia_fixa.json"),
+        "--referencia", os.path.join("tests", "referencia_latencia_fixa.json"),
+        "--tolerancia", "0.2",
+        "--limite", "30",
+    ]
+    resultado = subprocess.run(comando, cwd=RAIZ, capture_output=True, text=True, timeout=120)
+    assert resultado.returncode == 0, resultado.stdout + resultado.stderr
+    assert "Regressão" not in resultado.stdout
+    assert "0 descartados" in resultado.stdout
+
+
+# Perda, reordenação e partição (enlace_degradado.json): a carga termina sem violar a exclusão
+def test_enlace_degradado_exclusao_mutua(monkeypatch):
+    relatorio, violacoes = executar_verificando_exclusao(
+        monkeypatch,
+        [
+            "--nos", "3",
+            "--duracao", "5",
+            "--porta-base", "12601",
+            "--cenario", os.path.join(RAIZ, "cenarios", "enlace_degradado.json"),
+            "--retransmissao", "0.1",
+            "--limite", "30",
+        ],
+    )
+    assert violacoes == 0
+    assert all(processo["operacoes"] > 0 for processo in relatorio["processos"])
+    assert relatorio["falhas"]["descartados"] > 0
+
+
+# Perda constante no modo hierárquico: exercita reenvios e concessões repetidas
+def test_perda_constante_grupos_exclusao_mutua(monkeypatch):
+    relatorio, violacoes = executar_verificando_exclusao(
+        monkeypatch,
+        [
+            "--nos", "4",
+            "--grupos", "2",
+            "--duracao", "3",
+            "--porta-base", "12801",
+            "--cenario", os.path.join(RAIZ, "cenarios", "perda_constante.json"),
+            "--retransmissao", "0.1",
+            "--limite", "30",
+        ],
+    )
+    assert violacoes == 0
+    assert all(processo["operacoes"] > 0 for processo in relatorio["processos"])
+    assert relatorio["falhas"]["descartados"] > 0
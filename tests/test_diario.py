@@ -0,0 +1,62 @@
+from diario import CABECALHO, Diario
+
+
+def test_recupera_estado_consolidado(tmp_path):
+    caminho = str(tmp_path / "p1.diario")
+    d = Diario(caminho)
+    d.registrar({"limite_relogio": 1000, "recurso_ocupado": False})
+    d.registrar({"fila_recurso": [{"id": "p2", "timestamp": 3}]})
+    d.registrar({"recurso_ocupado": True})
+    d.fechar()
+
+    d = Diario(caminho)
+    assert d.recuperar() == {
+        "limite_relogio": 1000,
+        "recurso_ocupado": True,
+        "fila_recurso": [{"id": "p2", "timestamp": 3}],
+    }
+    assert d.registros == 3
+
+
+def test_registro_interrompido_e_descartado(tmp_path):
+    caminho = str(tmp_path / "p1.diario")
+    d = Diario(caminho)
+    d.registrar({"relogio": 1})
+    inicio = d.posicao
+    d.registrar({"relogio": 2})
+    # Corrompe o conteúdo do último registro, como uma escrita interrompida
+    d.mapa[inicio + CABECALHO.size] ^= 0xFF
+    d.fechar()
+
+    d = Diario(caminho)
+    assert d.recuperar() == {"relogio": 1}
+    assert d.posicao == inicio
+    # Novos registros sobrescrevem o resto do registro interrompido
+    d.registrar({"relogio": 3})
+    d.fechar()
+    assert Diario(caminho).recuperar() == {"relogio": 3}
+
+
+def test_compactacao_por_quantidade(tmp_path):
+    caminho = str(tmp_path / "p1.diario")
+    d = Diario(caminho, capacidade=4096, compactar_a_cada=10)
+    for i in range(100):
+        d.registrar({"relogio": i, "fila_recurso": [i]})
+    assert d.registros <= 10
+    d.fechar()
+
+    d = Diario(caminho, capacidade=4096)
+    assert d.recuperar() == {"relogio": 99, "fila_recurso": [99]}
+
+
+def test_compactacao_aumenta_capacidade(tmp_path):
+    caminho = str(tmp_path / "p1.diario")
+    d = Diario(caminho, capacidade=256)
+    fila = [{"id": f"p{i}", "timestamp": i} for i in range(50)]
+    d.registrar({"fila_recurso": fila})
+    assert d.capacidade > 256
+    d.fechar()
+
+    d = Diario(caminho, capacidade=256)
+    assert d.recuperar() == {"fila_recurso": fila}
+    assert not (tmp_path / "p1.diario.tmp").exists()
@@ -0,0 +1,45 @@
+from falhas import aplicar_fase, montar_proxies, selecionar_enlaces
+
+PROCESSOS = {
+    "p1": ("localhost", 5001),
+    "p2": ("localhost", 5002),
+    "p3": ("localhost", 5003),
+    "p4": ("localhost", 5004),
+}
+
+
+def particionados(proxies):
+    return {chave for chave, proxy in proxies.items() if proxy.particionado}
+
+
+def test_selecionar_enlaces():
+    proxies = montar_proxies(PROCESSOS, 6000)
+    assert len(proxies) == 12
+    assert selecionar_enlaces(proxies, "*") == list(proxies.values())
+    assert selecionar_enlaces(proxies, None) == list(proxies.values())
+    # Cada par listado vale nos dois sentidos
+    selecionados = selecionar_enlaces(proxies, [["p1", "p2"]])
+    assert {(p.origem, p.destino) for p in selecionados} == {("p1", "p2"), ("p2", "p1")}
+
+
+def test_aplicar_fase_configura_enlaces():
+    proxies = montar_proxies(PROCESSOS, 6000)
+    aplicar_fase(proxies, {"enlaces": [["p1", "p3"]], "latencia": 0.05, "perda": 0.1})
+    assert proxies[("p3", "p1")].parametros["latencia"] == 0.05
+    assert proxies[("p1", "p3")].parametros["perda"] == 0.1
+    assert proxies[("p1", "p2")].parametros["latencia"] == 0.0
+    # Fases seguintes só alteram os parâmetros que indicam
+    aplicar_fase(proxies, {"perda": 0.0})
+    assert proxies[("p1", "p3")].parametros["latencia"] == 0.05
+    assert proxies[("p1", "p3")].parametros["perda"] == 0.0
+    assert proxies[("p2", "p4")].parametros["perda"] == 0.0
+
+
+def test_particao_so_entre_lados_listados():
+    proxies = montar_proxies(PROCESSOS, 6000)
+    aplicar_fase(proxies, {"particao": [["p1", "p2"], ["p3"]]})
+    # p4 não foi listado e continua ligado a todos
+    assert particionados(proxies) == {("p1", "p3"), ("p3", "p1"), ("p2", "p3"), ("p3", "p2")}
+
+    aplicar_fase(proxies, {"particao": None})
+    assert particionados(proxies) == set()
@@ -0,0 +1,224 @@
+import json
+import queue
+import socket
+import threading
+import time
+
+import pytest
+
+import p1
+
+PROCESSOS = {f"p{i}": ("localhost", 5000 + i) for i in range(1, 6)}
+GRUPOS = {"g1": ["p1", "p2"], "g2": ["p3", "p4"], "g3": ["p5"]}
+
+
+def test_grupos_e_representantes(monkeypatch):
+    monkeypatch.setattr(p1, "PROCESSOS", PROCESSOS)
+    monkeypatch.setattr(p1, "GRUPOS", GRUPOS)
+    monkeypatch.setattr(p1, "ID_PROCESSO", "p4")
+    assert p1.grupo_de("p4") == "g2"
+    assert p1.grupo_de("p5") == "g3"
+    assert p1.representante_local() == "p3"
+    # O primeiro nível fica restrito ao grupo
+    assert p1.pares_locais() == {"p3"}
+
+    monkeypatch.setattr(p1, "ID_PROCESSO", "p3")
+    assert p1.representante_local() == "p3"
+    assert p1.representantes_remotos() == {"p1", "p5"}
+
+    # Sem grupos, todos disputam o primeiro nível
+    monkeypatch.setattr(p1, "GRUPOS", {})
+    assert p1.pares_locais() == {"p1", "p2", "p4", "p5"}
+
+
+# Estado limpo de um nó, com as mensagens enviadas registradas em vez de enviadas
+@pytest.fixture
+def enviadas(monkeypatch):
+    registro = []
+    monkeypatch.setattr(p1, "enviar_mensagem", lambda destino, mensagem, imediato=False: registro.append((destino, mensagem)))
+    estado = {
+        "PROCESSOS": PROCESSOS,
+        "GRUPOS": {},
+        "ID_PROCESSO": "p1",
+        "debug_mode": False,
+        "modo_interativo": False,
+        "relogio_local": 0,
+        "recurso_ocupado": False,
+        "esperando_recurso": None,
+        "timestamp_requisicao": 0,
+        "fila_recurso": [],
+        "respostas_esperadas": {},
+        "recurso_global": None,
+        "recurso_global_ocupado": False,
+        "esperando_global": None,
+        "timestamp_global": 0,
+        "solicitante_global": None,
+        "timestamp_pedido_global": 0,
+        "timestamp_pedido": 0,
+        "fila_global": [],
+        "respostas_globais": {},
+    }
+    for nome, valor in estado.items():
+        monkeypatch.setattr(p1, nome, valor)
+    return registro
+
+
+def mensagem(tipo, remetente, timestamp, recurso="r1", ref=None):
+    return {"tipo": tipo, "recurso": recurso, "timestamp": timestamp, "id": remetente, "ref": ref}
+
+
+def test_ack_de_requisicao_anterior_e_ignorado(enviadas, monkeypatch):
+    monkeypatch.setattr(p1, "esperando_recurso", "r1")
+    monkeypatch.setattr(p1, "timestamp_requisicao", 5)
+    monkeypatch.setattr(p1, "respostas_esperadas", {"r1": {"p2", "p3"}})
+    p1.processar_mensagem(mensagem("ack", "p2", 9, ref=3))
+    assert p1.respostas_esperadas["r1"] == {"p2", "p3"}
+    p1.processar_mensagem(mensagem("ack", "p2", 10, ref=5))
+    assert p1.respostas_esperadas["r1"] == {"p3"}
+
+
+def test_requisicao_reenviada_nao_duplica_a_fila(enviadas, monkeypatch):
+    monkeypatch.setattr(p1, "esperando_recurso", "r1")
+    monkeypatch.setattr(p1, "recurso_ocupado", True)
+    requisicao = mensagem("requisicao", "p2", 7)
+    p1.processar_mensagem(dict(requisicao))
+    p1.processar_mensagem(dict(requisicao))
+    assert p1.fila_recurso == [requisicao]
+    assert enviadas == []
+    # Outro recurso não é adiado
+    p1.processar_mensagem(mensagem("requisicao", "p3", 8, recurso="r2"))
+    assert [(destino, m["tipo"], m["ref"]) for destino, m in enviadas] == [("p3", "ack", 8)]
+
+
+def test_concessao_repetida_ou_de_pedido_liberado(enviadas, monkeypatch):
+    monkeypatch.setattr(p1, "GRUPOS", GRUPOS)
+    monkeypatch.setattr(p1, "ID_PROCESSO", "p2")
+    monkeypatch.setattr(p1, "timestamp_pedido", 5)
+    p1.processar_mensagem(mensagem("concessao_global", "p1", 9, ref=5))
+    p1.processar_mensagem(mensagem("concessao_global", "p1", 10, ref=5))
+    assert p1.recurso_global == "r1"
+    assert enviadas == []
+
+    with p1.cond_fila:
+        p1.liberar_global("r1")
+    # Concessão repetida depois da liberação: a liberação é reenviada
+    p1.processar_mensagem(mensagem("concessao_global", "p1", 11, ref=5))
+    assert [(destino, m["tipo"], m["ref"]) for destino, m in enviadas] == [
+        ("p1", "liberacao_global", 5),
+        ("p1", "liberacao_global", 5),
+    ]
+
+
+def test_requisicao_global_reenviada_repete_concessao(enviadas, monkeypatch):
+    monkeypatch.setattr(p1, "GRUPOS", GRUPOS)
+    monkeypatch.setattr(p1, "recurso_global_ocupado", True)
+    monkeypatch.setattr(p1, "esperando_global", "r1")
+    monkeypatch.setattr(p1, "solicitante_global", "p2")
+    monkeypatch.setattr(p1, "timestamp_pedido_global", 5)
+    monkeypatch.setattr(p1, "timestamp_global", 6)
+    requisicao = mensagem("requisicao_global", "p3", 8)
+    p1.processar_mensagem(dict(requisicao))
+    assert p1.fila_global == [requisicao]
+    assert enviadas == []
+
+    # O outro grupo reenviou: a concessão vai de novo ao membro que detém o recurso
+    p1.processar_mensagem(dict(requisicao))
+    assert [(destino, m["tipo"], m["ref"]) for destino, m in enviadas] == [("p2", "concessao_global", 5)]
+
+    # A liberação do membro responde ao grupo adiado
+    p1.processar_mensagem(mensagem("liberacao_global", "p2", 12, ref=5))
+    assert not p1.recurso_global_ocupado
+    assert [(destino, m["tipo"], m["ref"]) for destino, m in enviadas[1:]] == [("p3", "ack_global", 8)]
+
+
+# Socket local que registra cada quadro recebido (uma conexão por quadro)
+def escutar():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("localhost", 0))
+    server.listen(16)
+    quadros = queue.Queue()
+
+    def aceitar():
+        while True:
+            conn, addr = server.accept()
+            with conn:
+                partes = []
+                while parte := conn.recv(4096):
+                    partes.append(parte)
+            quadros.put((time.monotonic(), json.loads(b"".join(partes))))
+
+    threading.Thread(target=aceitar, daemon=True).start()
+    return server.getsockname(), quadros
+
+
+@pytest.fixture
+def agrupamento(monkeypatch):
+    endereco, quadros = escutar()
+    monkeypatch.setattr(p1, "PROCESSOS", {"p1": ("localhost", 5001), "p9": endereco})
+    monkeypatch.setattr(p1, "GRUPOS", {})
+    monkeypatch.setattr(p1, "debug_mode", False)
+    monkeypatch.setattr(p1, "janela_envio", 0.5)
+    monkeypatch.setattr(p1, "filas_envio", {})
+    monkeypatch.setattr(p1, "sinais_envio", {})
+    monkeypatch.setattr(p1, "urgentes", set())
+    monkeypatch.setattr(p1, "mensagens_enviadas", 0)
+    monkeypatch.setattr(p1, "quadros_enviados", 0)
+    return quadros
+
+
+def test_resposta_segue_de_carona_na_requisicao(agrupamento):
+    inicio = time.monotonic()
+    p1.enviar_ack("p9", "r1", 3)
+    time.sleep(0.05)
+    requisicao = {"tipo": "requisicao", "recurso": "r1", "timestamp": 9, "id": "p1"}
+    p1.enviar_mensagem("p9", requisicao)
+    chegada, quadro = agrupamento.get(timeout=2)
+    # A requisição não espera o fim da janela e leva o ACK pendente no mesmo quadro
+    assert chegada - inicio < 0.4
+    assert [m["tipo"] for m in quadro] == ["ack", "requisicao"]
+    assert quadro[0]["ref"] == 3
+    assert quadro[1] == requisicao
+    assert agrupamento.empty()
+    # Os contadores são atualizados logo depois que a conexão é fechada
+    prazo = time.monotonic() + 2
+    while not p1.quadros_enviados and time.monotonic() < prazo:
+        time.sleep(0.01)
+    assert (p1.mensagens_enviadas, p1.quadros_enviados) == (2, 1)
+
+
+def test_resposta_sozinha_espera_a_janela(agrupamento):
+    inicio = time.monotonic()
+    p1.enviar_ack("p9", "r1", 3)
+    p1.enviar_ack("p9", "r2", 4)
+    chegada, quadro = agrupamento.get(timeout=2)
+    assert chegada - inicio >= 0.45
+    assert [(m["recurso"], m["ref"]) for m in quadro] == [("r1", 3), ("r2", 4)]
+
+    # imediato=True dispensa a janela; um quadro com uma só mensagem não vira lista
+    inicio = time.monotonic()
+    p1.enviar_ack("p9", "r1", 5, imediato=True)
+    chegada, quadro = agrupamento.get(timeout=2)
+    assert chegada - inicio < 0.4
+    assert quadro["tipo"] == "ack" and quadro["ref"] == 5
+
+
+def test_servidor_processa_quadro_agrupado(enviadas, monkeypatch):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("localhost", 0))
+        porta = s.getsockname()[1]
+    monkeypatch.setattr(p1, "HOST", "localhost")
+    monkeypatch.setattr(p1, "PORT", porta)
+    monkeypatch.setattr(p1, "esperando_recurso", "r1")
+    monkeypatch.setattr(p1, "timestamp_requisicao", 5)
+    monkeypatch.setattr(p1, "respostas_esperadas", {"r1": {"p2", "p3"}})
+    threading.Thread(target=p1.servidor, daemon=True).start()
+    quadro = [mensagem("ack", "p2", 7, ref=5), mensagem("ack", "p3", 8, ref=5)]
+    for _ in range(50):
+        try:
+            with socket.create_connection(("localhost", porta)) as s:
+                s.sendall(json.dumps(quadro).encode())
+            break
+        except ConnectionRefusedError:
+            time.sleep(0.02)  # Servidor ainda subindo
+    with p1.cond_fila:
+        assert p1.cond_fila.wait_for(lambda: not p1.respostas_esperadas["r1"], timeout=2)